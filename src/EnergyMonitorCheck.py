@@ -4,18 +4,35 @@ Octopus Energy EV Charging Monitor
 Monitors energy usage and sends SMS alerts when high usage indicates potential EV charging
 """
 
+import asyncio
 import requests
+from requests.adapters import HTTPAdapter
 import json
-from datetime import datetime, timedelta
+import orjson
+import numpy as np
+from datetime import datetime, timedelta, timezone
 import time
+import sched
 import logging
+import sqlite3
 from twilio.rest import Client
+from tenacity import (
+    RetryError, before_sleep_log, retry, retry_if_exception, retry_if_exception_type,
+    stop_after_attempt, wait_exponential
+)
 import os
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+# aiohttp, polars and the async Twilio client are only needed for async/fleet
+# checks, so they are imported where used to keep single-meter runs fast
+if TYPE_CHECKING:
+    import aiohttp
 
 # Configure logging
+log_level_name = os.getenv('LOG_LEVEL', 'INFO').upper()
+log_level = logging.getLevelNamesMapping().get(log_level_name)
 logging.basicConfig(
-    level=logging.INFO,
+    level=log_level if log_level is not None else logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
         logging.FileHandler('energy_monitor.log'),
@@ -23,15 +40,70 @@ logging.basicConfig(
     ]
 )
 logger = logging.getLogger(__name__)
+if log_level is None:
+    logger.warning("Unknown LOG_LEVEL %r, using INFO", log_level_name)
+
+# Readings as parallel arrays: consumption (kWh per 30 minutes) and interval start (UTC)
+Readings = Tuple[np.ndarray, np.ndarray]
+
+
+def _is_transient_async_error(exc: BaseException) -> bool:
+    """Whether an async fetch error is worth retrying"""
+    import aiohttp
+    return isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+def _analyze_readings(cons: np.ndarray, baseline_per_interval: float, sustained_intervals: int) -> tuple:
+    """Usage statistics for the (non-empty) readings
+
+    Returns (total, peak, high count, sustained run seen, highest total over
+    any sustained window).
+    """
+    readings = np.asarray(cons, dtype=np.float64)
+    is_high = readings > baseline_per_interval
+    window = max(sustained_intervals, 1)
+
+    sustained = sustained_intervals <= 0
+    best_window = 0.0
+    if window <= len(readings):
+        # Prefix sums give every window total in O(N) regardless of its length
+        high_prefix = np.concatenate(([0], np.cumsum(is_high, dtype=np.int64)))
+        cons_prefix = np.concatenate(([0.0], np.cumsum(readings)))
+        sustained = sustained or bool((high_prefix[window:] - high_prefix[:-window] == window).any())
+        best_window = float((cons_prefix[window:] - cons_prefix[:-window]).max())
+
+    return float(readings.sum()), float(readings.max()), int(is_high.sum()), sustained, best_window
 
 
 class EnergyMonitor:
+    _alert_template = (
+        "🚗⚡ EV Charging Alert!\n\n"
+        "High energy usage detected at holiday property:\n"
+        "• Average: {average}kW\n"
+        "• Peak: {peak}kW\n"
+        "• Time: {time}\n\n"
+        "This suggests someone may be charging an electric vehicle."
+    )
+
     def __init__(self, config: Dict):
         """Initialize the energy monitor with configuration"""
         self.config = config
         self.octopus_api_key = config['octopus_api_key']
         self.meter_mpan = config['meter_mpan']
         self.meter_serial = config['meter_serial']
+
+        # Octopus API endpoint
+        self._consumption_url = f"https://api.octopus.energy/v1/electricity-meter-points/{self.meter_mpan}/meters/{self.meter_serial}/consumption/"
+        self._params_base = {
+            'order_by': 'period',
+            'page_size': 200
+        }
+
+        # Persistent HTTP session so connections are reused between checks
+        self._http = requests.Session()
+        self._http.auth = (self.octopus_api_key, '')
+        self._http.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
         self.twilio_client = Client(
             config['twilio_account_sid'],
             config['twilio_auth_token']
@@ -44,90 +116,303 @@ class EnergyMonitor:
         self.sustained_minutes = config.get('sustained_minutes', 240)  # minutes
         self.baseline_usage = config.get('baseline_usage_kw', 0.5)  # kW normal usage
 
+        # Thresholds in per-interval units (30-minute readings)
+        self._inv_half_hour = 2.0  # kWh per 30 minutes -> kW
+        self._baseline_consumption_per_interval = self.baseline_usage * 0.5  # kWh
+        self._sustained_intervals = self.sustained_minutes // 30
+
         # Alert management
         self.last_alert_time = None
         self.alert_cooldown = config.get('alert_cooldown_hours', 4) * 3600  # seconds
 
-    def get_consumption_data(self, hours_back: int = 2) -> List[Dict]:
-        """Get electricity consumption data from Octopus API"""
+        # Adaptive polling
+        self.max_poll_interval = config.get('max_poll_interval_hours', 6) * 3600  # seconds
+        self._poll_interval = None
+        self._last_reading_time = None
+
+        # Conditional-request cache for consumption responses, keyed by meter
+        # point and serial since import and export MPANs share a meter serial
+        # (the older serial-only table is dropped; it is only a cache)
+        self._cache = sqlite3.connect(config.get('cache_path', 'consumption_cache.db'))
+        self._cache.execute("DROP TABLE IF EXISTS consumption_cache")
+        self._cache.execute(
+            "CREATE TABLE IF NOT EXISTS consumption_responses ("
+            "meter_mpan TEXT, meter_serial TEXT, period_from TEXT, period_to TEXT, "
+            "etag TEXT, last_modified TEXT, body BLOB, "
+            "PRIMARY KEY (meter_mpan, meter_serial, period_from, period_to))"
+        )
+        self._cache.commit()
+
+        # Rolling buffer of the latest readings, oldest first
+        self._ring_size = 48  # 30-min intervals, so 48 = 24 hours
+        self._ring_cons, self._ring_ts = self._empty_readings()
+        self._last_end = None
+
+    @staticmethod
+    def _parse_epoch(timestamp: str) -> int:
+        """Parse an Octopus timestamp into epoch seconds"""
+        return int(datetime.fromisoformat(timestamp).timestamp())
+
+    @staticmethod
+    def _empty_readings() -> Readings:
+        """An empty pair of reading arrays"""
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype='datetime64[s]')
+
+    @staticmethod
+    def _readings_from_results(results: List[Dict]) -> Readings:
+        """Convert Octopus consumption results into parallel reading arrays"""
+        cons = np.fromiter(
+            (reading['consumption'] for reading in results),
+            dtype=np.float64,
+            count=len(results)
+        )
+        ts = np.fromiter(
+            (datetime.fromisoformat(reading['interval_start']).timestamp() for reading in results),
+            dtype=np.int64,
+            count=len(results)
+        ).astype('datetime64[s]')
+        return cons, ts
+
+    def _get_cached_response(self, start_str: str, end_str: str) -> Optional[tuple]:
+        """Look up a cached consumption response for the given period"""
+        return self._cache.execute(
+            "SELECT etag, last_modified, body FROM consumption_responses "
+            "WHERE meter_mpan = ? AND meter_serial = ? AND period_from = ? AND period_to = ?",
+            (self.meter_mpan, self.meter_serial, start_str, end_str)
+        ).fetchone()
+
+    def _store_cached_response(self, start_str: str, end_str: str, etag: Optional[str],
+                               last_modified: Optional[str], body: bytes):
+        """Store a consumption response along with its validators
+
+        Only the latest response per meter is kept: earlier incremental slices
+        are never requested again, so keeping them would grow the cache forever.
+        """
+        self._cache.execute(
+            "DELETE FROM consumption_responses WHERE meter_mpan = ? AND meter_serial = ?",
+            (self.meter_mpan, self.meter_serial)
+        )
+        self._cache.execute(
+            "INSERT INTO consumption_responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.meter_mpan, self.meter_serial, start_str, end_str, etag, last_modified, body)
+        )
+        self._cache.commit()
+
+    @staticmethod
+    def _window_end() -> int:
+        """End of the window Octopus can have published (midnight UTC yesterday, epoch seconds)"""
+        now = int(time.time())
+        return now - (now % 86400) - 86400
+
+    def _prepare_request(self, hours_back: int) -> Optional[tuple]:
+        """Build the consumption request for readings not yet buffered
+
+        Returns (url, params, headers, cached), or None when nothing newer
+        than the buffer can exist yet.
+        """
+        # Calculate time range (epoch seconds, ending at midnight UTC yesterday)
+        end_ts = self._window_end()
+        start_ts = end_ts - hours_back * 3600
+
+        # Drop buffered readings that have fallen out of the window
+        in_window = self._ring_ts >= np.datetime64(start_ts, 's')
+        self._ring_cons, self._ring_ts = self._ring_cons[in_window], self._ring_ts[in_window]
+
+        # Only request the slice after the newest buffered reading
+        if self._last_end is None or self._last_end < start_ts:
+            self._ring_cons, self._ring_ts = self._empty_readings()
+            fetch_from = start_ts
+        else:
+            fetch_from = self._last_end
+
+        if fetch_from >= end_ts:
+            return None
+
+        # Format timestamps for API (ISO format)
+        start_str = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(fetch_from))
+        end_str = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(end_ts))
+
+        params = {**self._params_base, 'period_from': start_str, 'period_to': end_str}
+
+        # Send validators from any cached response for this period
+        headers = {}
+        cached = self._get_cached_response(start_str, end_str)
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        return self._consumption_url, params, headers, cached
+
+    def _handle_response(self, status_code: int, body: bytes, response_headers,
+                         params: Dict, cached: Optional[tuple]) -> Readings:
+        """Merge a consumption response into the buffer and return the window"""
+        if status_code == 304 and cached:
+            data = orjson.loads(cached[2])
+        elif status_code == 200:
+            self._store_cached_response(
+                params['period_from'], params['period_to'],
+                response_headers.get('ETag'), response_headers.get('Last-Modified'), body
+            )
+            data = orjson.loads(body)
+        else:
+            logger.error("Octopus API error: %s - %s", status_code, body.decode(errors='replace'))
+            return self._empty_readings()
+
+        # Merge the new slice into the buffer (results are ordered by period)
+        results = data.get('results', [])
+        if results:
+            cons, ts = self._readings_from_results(results)
+            self._ring_cons = np.concatenate((self._ring_cons, cons))[-self._ring_size:]
+            self._ring_ts = np.concatenate((self._ring_ts, ts))[-self._ring_size:]
+            self._last_end = self._parse_epoch(results[-1]['interval_end'])
+
+        return self._ring_cons, self._ring_ts
+
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_exponential(multiplier=2, min=2, max=60),
+        retry=retry_if_exception_type(requests.exceptions.RequestException),
+        before_sleep=before_sleep_log(logger, logging.WARNING)
+    )
+    def get_consumption_data(self, hours_back: int = 2) -> Readings:
+        """Get electricity consumption data from Octopus API
+
+        Only readings newer than those already buffered are requested; the
+        buffered window is returned oldest first as (consumption, interval_start)
+        arrays. Network errors and 429/5xx responses are retried with
+        exponential backoff, raising tenacity.RetryError once exhausted.
+        """
         try:
-            # Calculate time range
-            end_date = datetime.today() - timedelta(hours=24)
-            end_time =  datetime(end_date.year, end_date.month, end_date.day)
-            #end_time = datetime(2025,4,24)
-            start_time = end_time - timedelta(hours=hours_back)
-
-            # Format timestamps for API (ISO format)
-            start_str = start_time.strftime('%Y-%m-%dT%H:%M:%SZ')
-            end_str = end_time.strftime('%Y-%m-%dT%H:%M:%SZ')
-
-            # Octopus API endpoint
-            url = f"https://api.octopus.energy/v1/electricity-meter-points/{self.meter_mpan}/meters/{self.meter_serial}/consumption/"
-
-            params = {
-                'period_from': start_str,
-                'period_to': end_str,
-                'order_by': 'period',
-                'page_size': 200
-            }
+            request = self._prepare_request(hours_back)
+            if request is None:
+                return self._ring_cons, self._ring_ts
+            url, params, headers, cached = request
 
             # Make API request
-            response = requests.get(
+            response = self._http.get(
                 url,
                 params=params,
-                auth=(self.octopus_api_key, ''),
+                headers=headers,
                 timeout=30
             )
 
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('results', [])
-            else:
-                logger.error(f"Octopus API error: {response.status_code} - {response.text}")
-                return []
+            # Transient server-side failures are raised so they get retried
+            if response.status_code == 429 or response.status_code >= 500:
+                response.raise_for_status()
+
+            return self._handle_response(response.status_code, response.content, response.headers, params, cached)
 
+        except requests.exceptions.RequestException:
+            raise
+        except Exception as e:
+            logger.error("Error fetching consumption data: %s", e)
+            return self._empty_readings()
+
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_exponential(multiplier=2, min=2, max=60),
+        retry=retry_if_exception(_is_transient_async_error),
+        before_sleep=before_sleep_log(logger, logging.WARNING)
+    )
+    async def get_consumption_data_async(self, session: 'aiohttp.ClientSession', hours_back: int = 2) -> Readings:
+        """Get electricity consumption data from Octopus API without blocking"""
+        import aiohttp
+
+        try:
+            request = self._prepare_request(hours_back)
+            if request is None:
+                return self._ring_cons, self._ring_ts
+            url, params, headers, cached = request
+
+            # Make API request
+            async with session.get(
+                url,
+                params=params,
+                headers=headers,
+                auth=aiohttp.BasicAuth(self.octopus_api_key, ''),
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                # Transient server-side failures are raised so they get retried
+                if response.status == 429 or response.status >= 500:
+                    response.raise_for_status()
+
+                body = await response.read()
+                return self._handle_response(response.status, body, response.headers, params, cached)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            raise
         except Exception as e:
-            logger.error(f"Error fetching consumption data: {e}")
-            return []
+            logger.error("Error fetching consumption data: %s", e)
+            return self._empty_readings()
+
+    def analyze_usage_pattern(self, cons: np.ndarray, ts: np.ndarray, presorted: bool = False) -> Dict:
+        """Analyze consumption data for EV charging patterns
 
-    def analyze_usage_pattern(self, consumption_data: List[Dict]) -> Dict:
-        """Analyze consumption data for EV charging patterns"""
-        if not consumption_data:
+        Pass presorted=True when the readings are already in chronological
+        order (as returned by get_consumption_data) to skip the ordering step.
+        """
+        if len(cons) == 0:
             return {'is_charging': False, 'reason': 'No data available'}
 
-        # Sort by timestamp (newest first from API)
-        consumption_data.sort(key=lambda x: x['interval_start'], reverse=True)
+        recent_count = 48  # 30-min intervals, so 48 = 24 hours
 
-        # Get recent readings (last 24 hour)
-        recent_readings = consumption_data[:48]  # 30-min intervals, so 48 = 24 hours
+        if presorted:
+            # Take the newest readings straight off the end, newest first
+            idx = np.arange(len(cons) - 1, max(len(cons) - recent_count, 0) - 1, -1)
+        else:
+            # Select the newest readings (last 24 hour) without sorting the whole window
+            ts_seconds = ts.astype('datetime64[s]').view(np.int64)
+            if len(ts_seconds) > recent_count:
+                idx = np.argpartition(-ts_seconds, recent_count)[:recent_count]
+            else:
+                idx = np.arange(len(ts_seconds))
+            idx = idx[np.argsort(-ts_seconds[idx], kind='stable')]
 
-        if len(recent_readings) < 2:
+        if len(idx) < 2:
             return {'is_charging': False, 'reason': 'Insufficient data'}
 
+        # Consumption (kWh per 30-minute interval), newest first
+        latest_reading_time = np.datetime_as_string(ts[idx[0]], unit='s') + 'Z'
+        cons = cons[idx]
+
+        # Sum, peak, high count and sustained window in a single pass
+        total_consumption, peak, high_usage_count, sustained, best_window = _analyze_readings(
+            cons, self._baseline_consumption_per_interval, self._sustained_intervals
+        )
+
+        return self._build_analysis(
+            total_consumption, peak, high_usage_count, sustained, best_window,
+            len(cons), latest_reading_time
+        )
+
+    def _build_analysis(self, total_consumption: float, peak: float, high_usage_count: int,
+                        sustained: bool, best_window: Optional[float], periods: int,
+                        latest_reading_time: str) -> Dict:
+        """Turn the reading statistics into an analysis result"""
         # Calculate average power for recent period
-        total_consumption = sum(reading['consumption'] for reading in recent_readings)
-        time_period_hours = len(recent_readings) * 0.5  # 30-minute intervals
+        time_period_hours = periods * 0.5  # 30-minute intervals
         day_power_kw = (total_consumption / time_period_hours) * 24
 
-        # Check for sustained high usage
-        high_usage_count = sum(
-            1 for reading in recent_readings
-            if (reading['consumption'] / 0.5) > self.baseline_usage
-        )
+        window = max(self._sustained_intervals, 1)
+        if window > periods or best_window is None:
+            sustained_power_kw = None
+        else:
+            sustained_power_kw = round(best_window / window * self._inv_half_hour, 2)
 
         # Determine if likely EV charging
-        is_charging = (
-                day_power_kw > self.high_usage_threshold and
-                high_usage_count >= (self.sustained_minutes // 30)  # sustained for required time
-        )
+        is_charging = day_power_kw > self.high_usage_threshold and sustained
 
         analysis = {
             'is_charging': is_charging,
             'average_power_kw': round(day_power_kw, 2),
-            'peak_power_kw': round(max(reading['consumption'] / 0.5 for reading in recent_readings), 2),
+            'peak_power_kw': round(peak * self._inv_half_hour, 2),
+            'sustained_power_kw': sustained_power_kw,
             'high_usage_periods': high_usage_count,
-            'total_periods_analyzed': len(recent_readings),
-            'latest_reading_time': recent_readings[0]['interval_start'] if recent_readings else None
+            'total_periods_analyzed': periods,
+            'latest_reading_time': latest_reading_time
         }
 
         if is_charging:
@@ -137,25 +422,26 @@ class EnergyMonitor:
 
         return analysis
 
+    def _compose_alert(self, analysis: Dict) -> str:
+        """Compose the SMS alert body"""
+        return self._alert_template.format(
+            average=analysis['average_power_kw'],
+            peak=analysis['peak_power_kw'],
+            time=datetime.now().strftime('%Y-%m-%d %H:%M')
+        )
+
     def send_alert(self, analysis: Dict):
         """Send SMS alert about potential EV charging"""
         try:
             # Check cooldown period
-            current_time = time.time()
-            if (self.last_alert_time and
+            current_time = time.monotonic()
+            if (self.last_alert_time is not None and
                     current_time - self.last_alert_time < self.alert_cooldown):
                 logger.info("Alert suppressed due to cooldown period")
                 return
 
             # Compose message
-            message = (
-                f"🚗⚡ EV Charging Alert!\n\n"
-                f"High energy usage detected at holiday property:\n"
-                f"• Average: {analysis['average_power_kw']}kW\n"
-                f"• Peak: {analysis['peak_power_kw']}kW\n"
-                f"• Time: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n\n"
-                f"This suggests someone may be charging an electric vehicle."
-            )
+            message = self._compose_alert(analysis)
 
             # Send SMS
             self.twilio_client.messages.create(
@@ -165,26 +451,56 @@ class EnergyMonitor:
             )
 
             self.last_alert_time = current_time
-            logger.info(f"Alert sent successfully: {analysis['average_power_kw']}kW usage detected")
+            logger.info("Alert sent successfully: %skW usage detected", analysis['average_power_kw'])
 
         except Exception as e:
-            logger.error(f"Error sending alert: {e}")
+            logger.error("Error sending alert: %s", e)
+
+    async def send_alert_async(self, analysis: Dict, twilio_client: Client):
+        """Send SMS alert about potential EV charging without blocking
+
+        twilio_client must use an AsyncTwilioHttpClient for this meter's
+        Twilio account (FleetMonitor keeps one per account).
+        """
+        try:
+            # Check cooldown period
+            current_time = time.monotonic()
+            if (self.last_alert_time is not None and
+                    current_time - self.last_alert_time < self.alert_cooldown):
+                logger.info("Alert suppressed due to cooldown period")
+                return
+
+            # Compose message
+            message = self._compose_alert(analysis)
+
+            # Send SMS
+            await twilio_client.messages.create_async(
+                body=message,
+                from_=self.twilio_from,
+                to=self.twilio_to
+            )
+
+            self.last_alert_time = current_time
+            logger.info("Alert sent successfully: %skW usage detected", analysis['average_power_kw'])
+
+        except Exception as e:
+            logger.error("Error sending alert: %s", e)
 
     def run_check(self):
         """Run a single monitoring check"""
         logger.info("Starting energy usage check...")
 
         # Get recent consumption data
-        consumption_data = self.get_consumption_data(hours_back=24)
+        cons, ts = self.get_consumption_data(hours_back=24)
 
-        if not consumption_data:
+        if len(cons) == 0:
             logger.warning("No consumption data received")
             return
 
         # Analyze for EV charging pattern
-        analysis = self.analyze_usage_pattern(consumption_data)
+        analysis = self.analyze_usage_pattern(cons, ts, presorted=True)
 
-        logger.info(f"Analysis: {analysis['reason']}")
+        logger.info("Analysis: %s", analysis['reason'])
 
         # Send alert if charging detected
         if analysis['is_charging']:
@@ -192,22 +508,211 @@ class EnergyMonitor:
 
         return analysis
 
+    @staticmethod
+    async def run_check_all(meters: List['EnergyMonitor']) -> List[Optional[Dict]]:
+        """Run a monitoring check for several meters concurrently"""
+        async with FleetMonitor(meters) as fleet:
+            return await fleet.run_check()
+
+    @staticmethod
+    def _seconds_until_next_publication() -> float:
+        """Seconds until 00:30 UTC, shortly after Octopus publishes the previous day's readings"""
+        now = datetime.now(timezone.utc)
+        target = now.replace(hour=0, minute=30, second=0, microsecond=0)
+        if target <= now:
+            target += timedelta(days=1)
+        return (target - now).total_seconds()
+
+    def _next_poll(self, analysis: Optional[Dict], check_interval_minutes: int) -> Tuple[float, bool]:
+        """Work out how long to sleep before the next check
+
+        Once the buffer reaches the end of the published window nothing more
+        will appear until the next publication, so sleep until then; otherwise
+        (including after a partial day) back off exponentially up to the cap.
+        Returns (seconds, from_now): from_now is True when the delay is
+        measured from the current time rather than the previous tick's target.
+        """
+        latest = analysis.get('latest_reading_time') if analysis else None
+        if latest and latest != self._last_reading_time:
+            self._last_reading_time = latest
+            self._poll_interval = check_interval_minutes * 60
+            if self._last_end is not None and self._last_end >= self._window_end():
+                return self._seconds_until_next_publication(), True
+
+        if self._poll_interval is None:
+            self._poll_interval = check_interval_minutes * 60
+        sleep_seconds = self._poll_interval
+        self._poll_interval = min(self._poll_interval * 2, self.max_poll_interval)
+        return sleep_seconds, False
+
     def run_continuous(self, check_interval_minutes: int = 30):
         """Run continuous monitoring"""
-        logger.info(f"Starting continuous monitoring (checking every {check_interval_minutes} minutes)")
+        logger.info("Starting continuous monitoring (checking every %d minutes)", check_interval_minutes)
+
+        # Ticks are scheduled against the monotonic clock. Fixed and backoff
+        # intervals are relative to the previous tick's target rather than its
+        # completion, so check duration doesn't accumulate as drift; waits for
+        # a wall-clock time are measured from now.
+        scheduler = sched.scheduler(time.monotonic, time.sleep)
 
-        while True:
+        def tick(deadline: float):
             try:
-                self.run_check()
-                logger.info(f"Sleeping for {check_interval_minutes} minutes...")
-                time.sleep(check_interval_minutes * 60)
+                analysis = self.run_check()
+                sleep_seconds, from_now = self._next_poll(analysis, check_interval_minutes)
+                logger.info("Sleeping for %.0f minutes...", sleep_seconds / 60)
+                if from_now:
+                    next_deadline = time.monotonic() + sleep_seconds
+                else:
+                    next_deadline = max(deadline + sleep_seconds, time.monotonic())
+            except RetryError as e:
+                logger.error("Error in monitoring loop: %s", e)
+                next_deadline = time.monotonic() + 300  # Wait 5 minutes before retrying
+
+            scheduler.enterabs(next_deadline, 1, tick, (next_deadline,))
+
+        start = time.monotonic()
+        scheduler.enterabs(start, 1, tick, (start,))
 
-            except KeyboardInterrupt:
-                logger.info("Monitoring stopped by user")
-                break
-            except Exception as e:
-                logger.error(f"Error in monitoring loop: {e}")
-                time.sleep(300)  # Wait 5 minutes before retrying
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            logger.info("Monitoring stopped by user")
+
+
+class FleetMonitor:
+    """Checks a portfolio of meters concurrently
+
+    All meters share one HTTP session and one Twilio HTTP client (with a
+    Twilio client per distinct account), and at most max_concurrency fetches run at once
+    to avoid overloading the Octopus API. The fetched readings are analyzed
+    together as a single polars frame.
+    """
+
+    def __init__(self, meters: List[EnergyMonitor], max_concurrency: int = 8):
+        """Initialize the fleet monitor with the meters to check"""
+        self.meters = meters
+        self.max_concurrency = max_concurrency
+        self.session = None
+        self.twilio_clients = {}
+        self._twilio_http = None
+        self._semaphore = None
+
+    async def __aenter__(self) -> 'FleetMonitor':
+        import aiohttp
+        from twilio.http.async_http_client import AsyncTwilioHttpClient
+
+        self.session = aiohttp.ClientSession()
+        self._twilio_http = AsyncTwilioHttpClient()
+        for meter in self.meters:
+            account_sid = meter.config['twilio_account_sid']
+            if account_sid not in self.twilio_clients:
+                self.twilio_clients[account_sid] = Client(
+                    account_sid,
+                    meter.config['twilio_auth_token'],
+                    http_client=self._twilio_http
+                )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+        await self._twilio_http.close()
+
+    def _twilio_client_for(self, meter: EnergyMonitor) -> Client:
+        """The shared Twilio client for a meter's account"""
+        return self.twilio_clients[meter.config['twilio_account_sid']]
+
+    async def fetch_meter(self, meter: EnergyMonitor) -> Readings:
+        """Fetch readings for one meter once a concurrency slot is free"""
+        async with self._semaphore:
+            try:
+                return await meter.get_consumption_data_async(self.session, hours_back=24)
+            except RetryError as e:
+                logger.error("Error checking meter %s: %s", meter.meter_serial, e)
+                return EnergyMonitor._empty_readings()
+
+    def analyze_fleet(self, readings: List[Readings]) -> List[Optional[Dict]]:
+        """Analyze every meter's readings in one columnar pass
+
+        readings holds each meter's chronological (consumption, interval_start)
+        arrays, in the same order as self.meters. Meters without data get None.
+        """
+        import polars as pl
+
+        counts = [len(cons) for cons, _ in readings]
+        if not any(counts):
+            return [None] * len(self.meters)
+
+        frame = pl.DataFrame({
+            'meter': np.repeat(np.arange(len(self.meters)), counts),
+            'ts': np.concatenate([ts for _, ts in readings]).astype('datetime64[ms]'),
+            'consumption': np.concatenate([cons for cons, _ in readings]),
+        })
+        thresholds = pl.DataFrame({
+            'meter': np.arange(len(self.meters)),
+            'baseline': [meter._baseline_consumption_per_interval for meter in self.meters],
+            'window': [max(meter._sustained_intervals, 1) for meter in self.meters],
+        })
+        frame = frame.join(thresholds, on='meter').sort('meter', 'ts')
+
+        # Label runs of consecutive high/normal readings within each meter
+        high = pl.col('consumption') > pl.col('baseline')
+        frame = frame.with_columns(is_high=high).with_columns(
+            run_id=(pl.col('is_high') != pl.col('is_high').shift(1)).fill_null(True).cum_sum().over('meter')
+        ).with_columns(
+            run_length=pl.len().over('meter', 'run_id')
+        )
+
+        # Trailing window totals, one rolling pass per distinct window length
+        frame = pl.concat([
+            part.with_columns(window_total=pl.col('consumption').rolling_sum(int(window)).over('meter'))
+            for window, part in ((w, frame.filter(pl.col('window') == w)) for w in frame['window'].unique())
+        ])
+
+        summary = frame.group_by('meter').agg(
+            total=pl.col('consumption').sum(),
+            peak=pl.col('consumption').max(),
+            high_count=pl.col('is_high').sum(),
+            sustained=(pl.col('is_high') & (pl.col('run_length') >= pl.col('window'))).any(),
+            best_window=pl.col('window_total').max(),
+        )
+        stats = {row['meter']: row for row in summary.iter_rows(named=True)}
+
+        analyses = []
+        for i, (meter, (cons, ts)) in enumerate(zip(self.meters, readings)):
+            if len(cons) == 0:
+                analyses.append(None)
+            elif len(cons) < 2:
+                analyses.append({'is_charging': False, 'reason': 'Insufficient data'})
+            else:
+                row = stats[i]
+                analyses.append(meter._build_analysis(
+                    row['total'], float(row['peak']), int(row['high_count']),
+                    meter._sustained_intervals <= 0 or bool(row['sustained']),
+                    row['best_window'], len(cons),
+                    np.datetime_as_string(ts[-1], unit='s') + 'Z'
+                ))
+        return analyses
+
+    async def run_check(self) -> List[Optional[Dict]]:
+        """Run a monitoring check for every meter"""
+        readings = await asyncio.gather(*(self.fetch_meter(meter) for meter in self.meters))
+        analyses = self.analyze_fleet(readings)
+
+        alerts = []
+        for meter, analysis in zip(self.meters, analyses):
+            if analysis is None:
+                logger.warning("No consumption data received for meter %s", meter.meter_serial)
+                continue
+
+            logger.info("Analysis (%s): %s", meter.meter_serial, analysis['reason'])
+
+            # Send alert if charging detected
+            if analysis['is_charging']:
+                alerts.append(meter.send_alert_async(analysis, self._twilio_client_for(meter)))
+
+        await asyncio.gather(*alerts)
+        return analyses
 
 
 def load_config() -> Dict:
@@ -229,6 +734,10 @@ def load_config() -> Dict:
         'sustained_minutes': int(os.getenv('SUSTAINED_MINUTES', '30')),
         'baseline_usage_kw': float(os.getenv('BASELINE_USAGE_KW', '0.8')),
         'alert_cooldown_hours': int(os.getenv('ALERT_COOLDOWN_HOURS', '4')),
+        'max_poll_interval_hours': int(os.getenv('MAX_POLL_INTERVAL_HOURS', '6')),
+
+        # Response cache
+        'cache_path': os.getenv('CACHE_PATH', 'consumption_cache.db'),
     }
 
     # Validate required config
@@ -265,7 +774,7 @@ def main():
             monitor.run_continuous()
 
     except Exception as e:
-        logger.error(f"Error in main: {e}")
+        logger.error("Error in main: %s", e)
         return 1
 
     return 0
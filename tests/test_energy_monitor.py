@@ -0,0 +1,392 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import orjson
+import pytest
+import tenacity
+
+import EnergyMonitorCheck
+from EnergyMonitorCheck import EnergyMonitor, FleetMonitor
+
+
+# sustained_minutes < 30, the default-style windows, and a window longer than the data
+SUSTAINED_MINUTES = [0, 15, 30, 90, 240, 1800]
+READING_COUNTS = [0, 1, 2, 5, 48]
+
+
+def make_monitor(**overrides):
+    config = {
+        'octopus_api_key': 'key',
+        'meter_mpan': '1200000000000',
+        'meter_serial': 'SERIAL',
+        'twilio_account_sid': 'AC00000000000000000000000000000000',
+        'twilio_auth_token': 'token',
+        'twilio_from_number': '+440000000000',
+        'twilio_to_number': '+440000000001',
+        'high_usage_threshold_kw': 10.0,
+        'baseline_usage_kw': 0.8,
+        'cache_path': ':memory:',
+    }
+    config.update(overrides)
+    return EnergyMonitor(config)
+
+
+def make_readings(count, seed=0):
+    """Chronological half-hourly readings, some exactly on the 0.8kW baseline"""
+    rng = np.random.default_rng(seed)
+    cons = rng.random(count) * 1.5
+    cons[::5] = 0.4
+    ts = (1_700_000_000 + np.arange(count) * 1800).astype('datetime64[s]')
+    return cons, ts
+
+
+def day_with_highs(high_positions):
+    """A day of 0.1 kWh readings with 2.0 kWh highs at the given intervals (12.4kW average for four highs)"""
+    cons, ts = make_readings(48)
+    cons[:] = 0.1
+    cons[list(high_positions)] = 2.0
+    return cons, ts
+
+
+def time_str(ts):
+    return np.datetime_as_string(ts, unit='s') + 'Z'
+
+
+def cache_rows(monitor):
+    return monitor._cache.execute(
+        "SELECT meter_mpan, meter_serial, period_from, period_to FROM consumption_responses"
+    ).fetchall()
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b'', headers=None):
+        self.status_code = status_code
+        self.content = body
+        self.text = body.decode()
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        import requests
+        raise requests.HTTPError(f"{self.status_code} error")
+
+
+class FakeOctopus:
+    """Stands in for the Octopus consumption endpoint on a monitor's session"""
+
+    def __init__(self, etag=None, published_until=None):
+        self.etag = etag
+        self.published_until = published_until
+        self.calls = []
+
+    def __call__(self, url, params=None, headers=None, timeout=None):
+        self.calls.append((dict(params), dict(headers or {})))
+        if self.etag and (headers or {}).get('If-None-Match') == self.etag:
+            return FakeResponse(304)
+
+        start = datetime.strptime(params['period_from'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+        end = datetime.strptime(params['period_to'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+        if self.published_until is not None:
+            end = min(end, datetime.fromtimestamp(self.published_until, timezone.utc))
+        results = []
+        while start < end:
+            results.append({
+                'consumption': 0.25,
+                'interval_start': start.isoformat(),
+                'interval_end': (start + timedelta(minutes=30)).isoformat(),
+            })
+            start += timedelta(minutes=30)
+        headers = {'ETag': self.etag} if self.etag else {}
+        return FakeResponse(200, orjson.dumps({'results': results}), headers)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def run_ticks(monkeypatch, monitor, analyses, check_seconds):
+    """Run the monitoring loop over the given check results, returning each check's start time"""
+    clock = FakeClock()
+    monkeypatch.setattr(EnergyMonitorCheck.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(EnergyMonitorCheck.time, 'sleep', clock.sleep)
+    starts = []
+    results = iter(analyses)
+
+    def run_check():
+        starts.append(clock.now)
+        clock.now += check_seconds
+        try:
+            return next(results)
+        except StopIteration:
+            raise KeyboardInterrupt
+
+    monitor.run_check = run_check
+    monitor.run_continuous(check_interval_minutes=30)
+    return starts
+
+
+@pytest.fixture
+def no_retry_wait(monkeypatch):
+    monkeypatch.setattr(EnergyMonitor.get_consumption_data.retry, 'sleep', lambda seconds: None)
+
+
+def test_ring_buffer_skips_request_until_new_data_can_exist(monkeypatch):
+    now = 1_750_000_000
+    monkeypatch.setattr(EnergyMonitorCheck.time, 'time', lambda: now)
+    monitor = make_monitor()
+    monitor._http.get = octopus = FakeOctopus()
+
+    first, _ = monitor.get_consumption_data(hours_back=24)
+    second, _ = monitor.get_consumption_data(hours_back=24)
+
+    assert len(octopus.calls) == 1
+    assert len(first) == len(second) == 48
+
+
+def test_ring_buffer_fetches_only_the_new_slice(monkeypatch):
+    now = 1_750_000_000
+    monkeypatch.setattr(EnergyMonitorCheck.time, 'time', lambda: now)
+    monitor = make_monitor()
+    monitor._http.get = octopus = FakeOctopus()
+    _, first_ts = monitor.get_consumption_data(hours_back=24)
+
+    # A day later the window has moved on by 48 intervals
+    now += 86400
+    _, ts = monitor.get_consumption_data(hours_back=24)
+
+    params = octopus.calls[1][0]
+    assert params['period_from'] == time_str(first_ts[-1] + np.timedelta64(1800, 's'))
+    assert len(ts) == 48
+    assert ts[0] == first_ts[-1] + np.timedelta64(1800, 's')
+    assert (np.diff(ts.astype(np.int64)) == 1800).all()
+
+
+def test_ring_buffer_restarts_after_a_gap(monkeypatch):
+    now = 1_750_000_000
+    monkeypatch.setattr(EnergyMonitorCheck.time, 'time', lambda: now)
+    monitor = make_monitor()
+    monitor._http.get = octopus = FakeOctopus()
+    monitor.get_consumption_data(hours_back=24)
+
+    # Three days later the buffered readings are all outside the window
+    now += 3 * 86400
+    _, ts = monitor.get_consumption_data(hours_back=24)
+
+    end_ts = now - (now % 86400) - 86400
+    assert octopus.calls[1][0]['period_from'] == time_str(np.datetime64(end_ts - 86400, 's'))
+    assert len(ts) == 48
+
+
+def test_transient_errors_are_retried(no_retry_wait):
+    monitor = make_monitor()
+    octopus = FakeOctopus()
+    responses = iter([FakeResponse(503), FakeResponse(429)])
+    monitor._http.get = lambda *args, **kwargs: next(responses, None) or octopus(*args, **kwargs)
+
+    cons, _ = monitor.get_consumption_data(hours_back=24)
+
+    assert len(cons) == 48
+
+
+def test_retries_give_up_with_retry_error(no_retry_wait):
+    monitor = make_monitor()
+    attempts = []
+    monitor._http.get = lambda *args, **kwargs: attempts.append(1) or FakeResponse(503)
+
+    with pytest.raises(tenacity.RetryError):
+        monitor.get_consumption_data(hours_back=24)
+    assert len(attempts) == 5
+
+
+def test_client_errors_are_not_retried(no_retry_wait):
+    monitor = make_monitor()
+    attempts = []
+    monitor._http.get = lambda *args, **kwargs: attempts.append(1) or FakeResponse(401, b'Unauthorized')
+
+    cons, _ = monitor.get_consumption_data(hours_back=24)
+
+    assert len(cons) == 0
+    assert len(attempts) == 1
+
+
+def test_publication_wait_is_measured_from_the_end_of_the_check(monkeypatch):
+    monitor = make_monitor()
+    monitor._last_end = monitor._window_end()
+    monkeypatch.setattr(monitor, '_seconds_until_next_publication', lambda: 3600.0)
+
+    starts = run_ticks(monkeypatch, monitor, [{'latest_reading_time': '2025-01-01T23:30:00Z'}], check_seconds=40)
+
+    assert starts == [1000.0, 1000.0 + 40 + 3600]
+
+
+def test_backoff_interval_is_measured_from_the_previous_target(monkeypatch):
+    monitor = make_monitor()
+
+    starts = run_ticks(monkeypatch, monitor, [None, None], check_seconds=40)
+
+    assert starts == [1000.0, 1000.0 + 1800, 1000.0 + 1800 + 3600]
+
+
+def test_partial_day_keeps_polling_until_the_day_is_complete(monkeypatch):
+    monkeypatch.setattr(EnergyMonitorCheck.time, 'time', lambda: 1_750_000_000)
+    monitor = make_monitor()
+    monkeypatch.setattr(monitor, '_seconds_until_next_publication', lambda: 3600.0)
+    # Only the readings up to 6pm have been published so far
+    monitor._http.get = octopus = FakeOctopus(published_until=monitor._window_end() - 6 * 3600)
+
+    partial = monitor.analyze_usage_pattern(*monitor.get_consumption_data(hours_back=24), presorted=True)
+    assert partial['total_periods_analyzed'] == 36
+    assert monitor._next_poll(partial, check_interval_minutes=30) == (1800, False)
+
+    octopus.published_until = None
+    complete = monitor.analyze_usage_pattern(*monitor.get_consumption_data(hours_back=24), presorted=True)
+    assert complete['total_periods_analyzed'] == 48
+    assert monitor._next_poll(complete, check_interval_minutes=30) == (3600.0, True)
+
+
+def test_not_modified_response_is_served_from_cache():
+    monitor = make_monitor()
+    monitor._http.get = octopus = FakeOctopus(etag='"v1"')
+
+    cons, _ = monitor.get_consumption_data(hours_back=24)
+
+    # Forget the buffer so the same period is requested again
+    monitor._ring_cons, monitor._ring_ts = monitor._empty_readings()
+    monitor._last_end = None
+    cached_cons, _ = monitor.get_consumption_data(hours_back=24)
+
+    assert octopus.calls[1][1]['If-None-Match'] == '"v1"'
+    assert len(cons) == 48
+    np.testing.assert_array_equal(cached_cons, cons)
+
+
+def test_cache_keeps_only_latest_response_per_meter():
+    monitor = make_monitor()
+    other = make_monitor(meter_serial='OTHER')
+    # An export meter point on the same physical meter shares its serial
+    export = make_monitor(meter_mpan='1300000000000')
+    other._cache = export._cache = monitor._cache
+
+    monitor._store_cached_response('2025-01-01T00:00:00Z', '2025-01-02T00:00:00Z', None, None, b'{}')
+    other._store_cached_response('2025-01-01T00:00:00Z', '2025-01-02T00:00:00Z', None, None, b'{}')
+    export._store_cached_response('2025-01-01T00:00:00Z', '2025-01-02T00:00:00Z', None, None, b'{}')
+    monitor._store_cached_response('2025-01-02T00:00:00Z', '2025-01-03T00:00:00Z', None, None, b'{}')
+
+    assert sorted(cache_rows(monitor)) == [
+        ('1200000000000', 'OTHER', '2025-01-01T00:00:00Z', '2025-01-02T00:00:00Z'),
+        ('1200000000000', 'SERIAL', '2025-01-02T00:00:00Z', '2025-01-03T00:00:00Z'),
+        ('1300000000000', 'SERIAL', '2025-01-01T00:00:00Z', '2025-01-02T00:00:00Z'),
+    ]
+    assert export._get_cached_response('2025-01-01T00:00:00Z', '2025-01-02T00:00:00Z') is not None
+    assert monitor._get_cached_response('2025-01-01T00:00:00Z', '2025-01-02T00:00:00Z') is None
+
+
+def test_fleet_uses_each_meters_twilio_account():
+    first = make_monitor()
+    second = make_monitor(meter_serial='OTHER')
+    other_account = make_monitor(
+        meter_serial='THIRD',
+        twilio_account_sid='AC11111111111111111111111111111111',
+        twilio_auth_token='other-token'
+    )
+
+    async def clients():
+        async with FleetMonitor([first, second, other_account]) as fleet:
+            return fleet, [fleet._twilio_client_for(meter) for meter in fleet.meters]
+
+    fleet, meter_clients = asyncio.run(clients())
+
+    assert len(fleet.twilio_clients) == 2
+    assert meter_clients[0] is meter_clients[1]
+    assert [client.username for client in meter_clients] == [
+        first.config['twilio_account_sid'],
+        second.config['twilio_account_sid'],
+        'AC11111111111111111111111111111111',
+    ]
+
+
+@pytest.mark.parametrize('sustained_minutes, high_positions, expected', [
+    (120, [20, 21, 22, 23], True),
+    (120, [5, 15, 25, 35], False),
+    (135, [20, 21, 22, 23], True),
+    (150, [20, 21, 22, 23], False),
+    (15, [5, 15, 25, 35], True),
+    (0, [5, 15, 25, 35], True),
+])
+def test_charging_needs_a_sustained_run_of_highs(sustained_minutes, high_positions, expected):
+    monitor = make_monitor(sustained_minutes=sustained_minutes)
+    cons, ts = day_with_highs(high_positions)
+
+    analysis = monitor.analyze_usage_pattern(cons, ts, presorted=True)
+
+    assert analysis['average_power_kw'] == 12.4
+    assert analysis['high_usage_periods'] == 4
+    assert analysis['is_charging'] is expected
+
+
+def test_unsorted_readings_use_the_newest_day_in_order():
+    monitor = make_monitor(sustained_minutes=120)
+    cons, ts = make_readings(60)
+    # The oldest 12 readings are the largest, but fall outside the newest 48
+    cons[:12] = 5.0
+    cons[12:] = 0.1
+    cons[40:44] = 2.0
+    shuffle = np.random.default_rng(1).permutation(60)
+
+    analysis = monitor.analyze_usage_pattern(cons[shuffle], ts[shuffle])
+
+    assert analysis == monitor.analyze_usage_pattern(cons[12:], ts[12:], presorted=True)
+    assert analysis['peak_power_kw'] == 4.0
+    assert analysis['total_periods_analyzed'] == 48
+    assert analysis['high_usage_periods'] == 4
+    assert analysis['is_charging'] is True
+    assert analysis['latest_reading_time'] == time_str(ts[-1])
+
+
+@pytest.mark.parametrize('count', READING_COUNTS)
+def test_fleet_analysis_matches_single_meter(count):
+    meters = [make_monitor(sustained_minutes=minutes) for minutes in SUSTAINED_MINUTES]
+    readings = [make_readings(count, seed) for seed in range(len(meters))]
+
+    fleet_analyses = FleetMonitor(meters).analyze_fleet(readings)
+
+    for meter, (cons, ts), fleet_analysis in zip(meters, readings, fleet_analyses):
+        if count == 0:
+            assert fleet_analysis is None
+        else:
+            assert fleet_analysis == meter.analyze_usage_pattern(cons, ts, presorted=True)
+
+
+def test_fleet_analysis_with_mixed_reading_counts():
+    meters = [make_monitor(sustained_minutes=minutes) for minutes in SUSTAINED_MINUTES]
+    readings = [make_readings(count, seed) for seed, count in enumerate([48, 0, 5, 2, 1, 48])]
+
+    fleet_analyses = FleetMonitor(meters).analyze_fleet(readings)
+
+    for meter, (cons, ts), fleet_analysis in zip(meters, readings, fleet_analyses):
+        if len(cons) == 0:
+            assert fleet_analysis is None
+        else:
+            assert fleet_analysis == meter.analyze_usage_pattern(cons, ts, presorted=True)
+
+
+def test_readings_on_the_baseline_are_not_high():
+    monitor = make_monitor()
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    cons, ts = monitor._readings_from_results([
+        {'consumption': 0.4, 'interval_start': (start + timedelta(minutes=30 * i)).isoformat()}
+        for i in range(48)
+    ])
+
+    analysis = monitor.analyze_usage_pattern(cons, ts, presorted=True)
+    fleet_analysis, = FleetMonitor([monitor]).analyze_fleet([(cons, ts)])
+
+    assert analysis['high_usage_periods'] == 0
+    assert fleet_analysis['high_usage_periods'] == 0